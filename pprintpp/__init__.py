@@ -4,12 +4,15 @@ import io
 import os
 import ast
 import sys
+import json
+import codecs
 import warnings
+import itertools
 import unicodedata
 
 __all__ = [
     "pprint", "pformat", "isreadable", "isrecursive", "saferepr",
-    "PrettyPrinter",
+    "pprint_diff", "pformat_diff", "PrettyPrinter", "IncrementalPrettyPrinter",
 ]
 
 
@@ -41,10 +44,14 @@ if PY3:
     unichr = chr
     from .safesort import safesort
     _iteritems = lambda x: x.items()
+    from collections.abc import Iterator, MappingView
+    _range_type = range
 else:
     chr_to_ascii = lambda x: repr(x)[2:-1]
     safesort = sorted
     _iteritems = lambda x: x.iteritems()
+    from collections import Iterator, MappingView
+    _range_type = xrange
 
 
 def _sorted_py2(iterable):
@@ -72,6 +79,19 @@ else:
             return False
         return True
 
+if PY3:
+    _text_writer = lambda write: write
+else:
+    def _text_writer(write):
+        """ Wraps ``write`` (ex, ``io.StringIO.write``, which only accepts
+            ``unicode``) so it also accepts native strings (ex, the result of
+            ``repr``), the same way ``PPrintState.write`` does. """
+        def text_write(data):
+            if isinstance(data, BytesType):
+                data = data.decode("latin1")
+            write(data)
+        return text_write
+
 #
 # End compatibility stuff
 #
@@ -84,6 +104,16 @@ class TextIO(io.TextIOWrapper):
         self.flush()
         return self.buffer.getvalue().decode(self.encoding)
 
+def _get_default_encoding():
+    """ Returns the encoding a ``TextIO`` uses by default, which is the
+        encoding strings have always been escaped for by ``pformat``. """
+    global _default_encoding
+    if _default_encoding is None:
+        _default_encoding = TextIO().encoding
+    return _default_encoding
+
+_default_encoding = None
+
 
 # pprintpp will make an attempt to print as many Unicode characters as is
 # safely possible. It will use the character category along with this table to
@@ -139,6 +169,70 @@ ascii_table = dict(
     for i in range(255)
 )
 
+def _mk_encodable_test(encoding):
+    """ Returns a function which checks whether a character can be written
+        to a stream with ``encoding``, or ``None`` if every character can be
+        (ex, because the encoding is one of the UTFs). """
+    if not encoding:
+        return None
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return None
+    if name.startswith("utf"):
+        return None
+    # Encoding with errors="ignore" produces nothing for unencodable
+    # characters, which avoids raising (and catching) an exception for each.
+    return lambda char: bool(char.encode(name, "ignore"))
+
+class _EscapeTable(dict):
+    """ A ``TextType.translate`` table which maps each character to the way
+        it should be written inside a string literal quoted with ``quote``,
+        on a stream with ``encoding``.
+
+        Entries are computed the first time a character is seen, so the
+        category lookup and encoding check are done at most once per
+        character (see ``_get_escape_table``). """
+
+    def __init__(self, encoding, quote):
+        dict.__init__(self)
+        self.is_encodable = _mk_encodable_test(encoding)
+        # Note: on Python 2, ``unicode.translate`` only accepts ``unicode``
+        # values, and the escapes are native (byte) strings.
+        self[ord(quote)] = TextType("\\" + quote)
+
+    def __missing__(self, code):
+        char = unichr(code)
+        if (
+            code > 0x7F and
+            unicode_printable_categories.get(unicodedata.category(char)) and
+            (self.is_encodable is None or self.is_encodable(char))
+        ):
+            escaped = char
+        else:
+            escaped = TextType(ascii_table.get(char) or chr_to_ascii(char))
+        self[code] = escaped
+        return escaped
+
+_escape_tables = {}
+
+def _get_escape_table(encoding, quote):
+    key = (encoding, quote)
+    table = _escape_tables.get(key)
+    if table is None:
+        table = _escape_tables[key] = _EscapeTable(encoding, quote)
+    return table
+
+def _repr_text(text, encoding):
+    if _isascii(text):  # Optimalization
+        return repr(text)
+    if "'" in text and '"' not in text:
+        quote = '"'
+    else:
+        quote = "'"
+    table = _get_escape_table(encoding, quote)
+    return u_prefix + quote + text.translate(table) + quote
+
 def pprint(object, stream=None, indent=4, width=80, depth=None):
     """Pretty-print a Python object to a stream [default is sys.stdout]."""
     printer = PrettyPrinter(
@@ -149,9 +243,27 @@ def pformat(object, indent=4, width=80, depth=None):
     """Format a Python object into a pretty-printed representation."""
     return PrettyPrinter(indent=indent, width=width, depth=depth).pformat(object)
 
-def saferepr(object):
-    """Version of repr() which can handle recursive data structures."""
-    return PrettyPrinter().pformat(object)
+def pprint_diff(a, b, stream=None, indent=4, width=80, depth=None):
+    """Pretty-print the differences between two Python objects to a stream
+    [default is sys.stdout]."""
+    printer = PrettyPrinter(
+        stream=stream, indent=indent, width=width, depth=depth)
+    printer.pprint_diff(a, b)
+
+def pformat_diff(a, b, indent=4, width=80, depth=None):
+    """Format the differences between two Python objects, one changed path
+    per line."""
+    printer = PrettyPrinter(indent=indent, width=width, depth=depth)
+    return printer.pformat_diff(a, b)
+
+def saferepr(object, maxlen=4096):
+    """Version of repr() which can handle recursive data structures.
+
+    The result is always a single line (newlines in the reprs of other
+    objects are escaped as ``\\n``), and is truncated (ending with "...")
+    if it would be longer than ``maxlen`` characters (``None`` for no
+    limit)."""
+    return _saferepr_printer.saferepr(object, maxlen=maxlen)
 
 def isreadable(object):
     """Determine if saferepr(object) is readable by eval()."""
@@ -184,10 +296,54 @@ def monkeypatch(mod=None, quiet=False):
     sys.modules["pprint_original"] = pprint
     sys.modules["pprint"] = mod or sys.modules["pprintpp"]
 
+class OutputTruncated(Exception):
+    pass
+
+
+class TruncatingWriter(object):
+    """ A stream which passes at most ``limit`` characters through to
+        ``stream``, then raises ``OutputTruncated`` (which stops the printer).
+    """
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.remaining = limit
+
+    def write(self, data):
+        if len(data) > self.remaining:
+            self.stream.write(data[:self.remaining])
+            self.remaining = 0
+            raise OutputTruncated()
+        self.remaining -= len(data)
+        self.stream.write(data)
+
+
+def _clip_to_stream(value, stream):
+    """ Returns the string, bytes, or ``memoryview`` ``value``, cut to the
+        number of characters ``stream`` will still accept if it's a
+        ``TruncatingWriter``: every item takes at least one character in a
+        literal, so the rest could never be written (and building a literal
+        of a huge value only to truncate it can take a long time). """
+    if isinstance(stream, TruncatingWriter) and len(value) > stream.remaining:
+        return value[:stream.remaining]
+    return value
+
+
 class PPrintSharedState(object):
     recursive = False
     readable = True
     cur_line_length = 0
+    # The ids of the containers which appear more than once (see
+    # ``label_shared``), or ``None`` if no labels are needed; the label given
+    # to each of them, by id; and their ids, in the order they were labelled.
+    shared = None
+    labels = None
+    labelled = None
+
+    def __init__(self):
+        # Items taken from lazily formatted iterables (see
+        # ``PrettyPrinter._get_iter_items``), by id.
+        self.iter_items = {}
 
     def clone(self):
         new = type(self)()
@@ -201,8 +357,15 @@ class PPrintState(object):
     max_width = 80
     max_depth = None
     stream = None
+    encoding = None
     context = None
     write_constrain = None
+    oneline = False
+    most_common = None
+    max_iter_items = None
+    max_bytes = None
+    output = None
+    label_shared = False
 
     class WriteConstrained(Exception):
         pass
@@ -215,12 +378,21 @@ class PPrintState(object):
         assert self.indent >= 0, "indent must be >= 0"
         assert self.max_depth is None or self.max_depth > 0, "depth must be > 0"
         assert self.max_width, "width must be != 0"
+        assert self.most_common is None or self.most_common >= 0, \
+            "most_common must be >= 0"
+        assert self.max_iter_items is None or self.max_iter_items > 0, \
+            "max_iter_items must be > 0"
+        assert self.max_bytes is None or self.max_bytes >= 0, \
+            "max_bytes must be >= 0"
+        assert self.output in (None, "literal", "json"), \
+            "output must be None, 'literal', or 'json'"
 
     def replace(self, **attrs):
         new_state = type(self)()
         new_state.__dict__.update(self.__dict__)
         new_state.__dict__.update(attrs)
-        new_state.context = dict(new_state.context)
+        if "context" not in attrs:
+            new_state.context = dict(new_state.context)
         new_state.s = self.s
         return new_state
 
@@ -233,7 +405,10 @@ class PPrintState(object):
     def write(self, data):
         if self.write_constrain is not None:
             self.write_constrain -= len(data)
-            if self.write_constrain < 0:
+            # Constrained writes are only used to check whether something
+            # will fit on one line, so there's no point continuing once a
+            # newline has been written.
+            if self.write_constrain < 0 or "\n" in data:
                 raise self.WriteConstrained
 
         if isinstance(data, BytesType):
@@ -246,7 +421,15 @@ class PPrintState(object):
             self.s.cur_line_length = len(data) - (nl_idx + 1)
 
     def get_indent_string(self):
-        return (self.level * self.indent) * " "
+        width = self.level * self.indent
+        if width < _max_cached_indent:
+            return _indent_strings[width]
+        return width * " "
+
+# Indent strings are needed for every line, so the common ones are only built
+# once.
+_max_cached_indent = 256
+_indent_strings = [width * " " for width in range(_max_cached_indent)]
 
 def _mk_open_close_empty_dict(type_tuples):
     """ Generates a dictionary mapping either ``cls.__repr__`` xor ``cls`` to
@@ -269,8 +452,238 @@ def _mk_open_close_empty_dict(type_tuples):
             res[cls.__repr__] = (cls, ) + open_close_empty
     return res
 
+# The narrowest possible one-line rendering of a single item, by container
+# type (ex, a dict item is at least ``k: v``, an odict item ``(k, v)``).
+_min_item_width = {
+    "dict": 4,
+    "odict": 6,
+}
+
+# The widest possible ``repr`` of a float (ex, ``-1.7976931348623157e+308``).
+_max_float_width = 24
+
+if PY3:
+    _int_types = (int, )
+    _isprintable = TextType.isprintable
+else:
+    _int_types = (int, long)
+    _isprintable = None
+
+# Python 2.6 has no ``memoryview`` (without which bytes, ``bytearray``s, and
+# ``memoryview``s are formatted by their repr), and no ``int.bit_length``
+_has_bit_length = hasattr(int, "bit_length")
+try:
+    _memoryview = memoryview
+except NameError:
+    _memoryview = None
+
+# Builtin types whose repr is short, never contains a newline, and which are
+# always formatted with ``repr``.
+_simple_scalar_types = frozenset((type(None), bool, float) + _int_types)
+
+def _scalar_width_bound(object):
+    """ Returns an upper bound on the width of ``object``'s repr without
+        actually formatting it, or ``None`` if ``object`` isn't one of the
+        handful of builtin scalars we know how to estimate. Only exact types
+        are considered, as subclasses (ex, ``IntEnum``) can have arbitrary
+        reprs. """
+    typ = type(object)
+    if object is None or typ is bool:
+        return 5
+    if typ in _int_types:
+        if not _has_bit_length:
+            return len(repr(object))
+        # log10(2) ~= 0.30103; plus one for rounding and one for the sign
+        return int(object.bit_length() * 0.30103) + 2
+    if typ is float:
+        return _max_float_width
+    if typ is TextType and _isprintable is not None:
+        if not (_isascii(object) and _isprintable(object)):
+            return None
+        # At worst every backslash and quote will be escaped
+        return (
+            len(object) + 2 + len(u_prefix) +
+            object.count("\\") + object.count("'") + object.count('"')
+        )
+    return None
+
+def _oneline_width_bounds(object, typeish, available, depth_limited=False):
+    """ Returns ``(min_width, max_width)``: bounds on the width of the
+        one-line rendering of the items in ``object`` (excluding the opener
+        and closer, which are accounted for by the caller).
+
+        ``min_width`` is derived from the number of items alone, so it can be
+        used to reject a one-line layout without looking at any items.
+
+        ``max_width`` will be ``None`` unless every item is a scalar with a
+        known width bound (see ``_scalar_width_bound``), and the sum of those
+        bounds is only computed if ``min_width`` is less than ``available``
+        (which also guarantees that only a handful of items are inspected). """
+    length = len(object)
+    min_width = (
+        length * _min_item_width.get(typeish, 1) +
+        (length - 1) * 2 +
+        (2 if typeish == "tuple" and length == 1 else 0)
+    )
+    if min_width > available:
+        return min_width, None
+
+    if typeish in ("dict", "odict"):
+        scalars = itertools.chain.from_iterable(_iteritems(object))
+        max_width = (length - 1) * 2 + length * (typeish == "dict" and 2 or 4)
+    else:
+        scalars = object
+        max_width = (length - 1) * 2 + (typeish == "tuple" and 2 or 0)
+
+    for scalar in scalars:
+        bound = _scalar_width_bound(scalar)
+        if bound is None:
+            return min_width, None
+        if depth_limited and bound < 3:
+            # Items past the depth limit are replaced by "..."
+            bound = 3
+        max_width += bound
+        if max_width > available:
+            return min_width, None
+    return min_width, max_width
+
+def _diff_same(a, b):
+    """ Returns ``True`` if ``a`` and ``b`` are the same object, or are equal
+        and of the same type (note that containers which are equal can still
+        have different representations, ex, ``[1]`` and ``[1.0]``). """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    try:
+        return bool(a == b)
+    except Exception:
+        # Ex, a RecursionError from comparing two distinct recursive
+        # structures, or numpy arrays, which refuse to be bool'd.
+        return False
+
+# The length of ``repr(b"")``: the overhead of each chunk of a bytes literal.
+_empty_bytes_repr_len = len(repr(BytesType()))
+
+# The number of bytes copied (and repr'd) at a time by ``_write_bytes``
+_bytes_block_size = 1 << 16
+
+# The length of escape sequences which are longer than two characters, by
+# their second character (ex, ``\xff``).
+_escape_lengths = {"x": 4, "u": 6, "U": 10}
+
+def _escape_boundary(content, start, end):
+    """ Returns the largest index which is no greater than ``end`` at which
+        ``content`` (the contents of a string or bytes literal, starting at
+        ``start``) can be split without splitting an escape sequence. """
+    esc = content.rfind("\\", max(start, end - 9), end)
+    if esc < 0 or not _is_escape_start(content, start, esc):
+        return end
+    if esc + _escape_lengths.get(content[esc + 1], 2) > end:
+        return esc
+    return end
+
+def _is_escape_start(content, start, index):
+    """ Returns ``True`` if the backslash at ``content[index]`` starts an
+        escape sequence (rather than ending an escaped backslash), given that
+        an escape sequence doesn't start before ``start`` and end after it.
+    """
+    # Backslashes are escaped as ``\\``, so ``content[index]`` only starts an
+    # escape if it is the odd one out in a run of backslashes.
+    run = content[start:index + 1]
+    return (len(run) - len(run.rstrip("\\"))) % 2 == 1
+
+def _byte_view(object):
+    """ Returns a ``memoryview`` of ``object`` if it's a one-dimensional view
+        of unsigned bytes, or ``None`` otherwise.
+
+        Other views aren't cast to bytes, as that would hide their format and
+        shape (and the result wouldn't eval to an equivalent view). """
+    try:
+        view = _memoryview(object)
+    except TypeError:
+        return None
+    if view.ndim != 1 or view.format != "B":
+        return None
+    return view
+
+def _json_float(object):
+    # The same as ``json``, which writes NaN and infinity as JavaScript does
+    if object != object:
+        return "NaN"
+    if object in (_infinity, -_infinity):
+        return object > 0 and "Infinity" or "-Infinity"
+    return float.__repr__(object)
+
+_infinity = float("inf")
+_json_string = json.encoder.encode_basestring_ascii
+_json_strings = frozenset((TextType, str))
+_json_encoder = json.JSONEncoder(
+    sort_keys=True,
+    separators=(",", ":"),
+    check_circular=False,
+)
+
+# How ``_iter_compact`` writes scalars, by exact type
+_literal_scalars = dict((typ, repr) for typ in _simple_scalar_types)
+_json_scalars = {
+    type(None): lambda object: "null",
+    bool: lambda object: object and "true" or "false",
+    float: _json_float,
+}
+for _typ in _int_types:
+    # Not ``__repr__``: Python 2's ``long`` has an ``L`` suffix
+    _json_scalars[_typ] = _typ.__str__
+for _typ in _json_strings:
+    _json_scalars[_typ] = _json_string
+
+_json_plain_containers = frozenset((dict, list, tuple))
+
+def _is_plain_json(object):
+    """ Returns ``True`` if ``object`` is made up only of JSON scalars, lists,
+        tuples, and dicts with string keys (and each container appears only
+        once), so encoding it with ``json`` gives the same result as
+        ``_iter_compact``. """
+    typ = type(object)
+    if typ not in _json_plain_containers:
+        return typ in _json_scalars
+    seen = set([id(object)])
+    stack = [object]
+    while stack:
+        object = stack.pop()
+        if type(object) is dict:
+            for key in object:
+                if type(key) not in _json_strings:
+                    return False
+            object = object.values()
+        for item in object:
+            typ = type(item)
+            if typ in _json_plain_containers:
+                objid = id(item)
+                if objid in seen:
+                    return False
+                seen.add(objid)
+                stack.append(item)
+            elif typ not in _json_scalars:
+                return False
+    return True
+
+# Objects which can be formatted lazily (see ``max_iter_items``), except for
+# files: iterating over a file reads from it (or fails, if it's closed or not
+# readable), so they're always formatted by their repr.
+_lazy_iterable_types = (Iterator, MappingView, _range_type)
+_not_lazy_iterable_types = PY3 and (io.IOBase, ) or (io.IOBase, file)
+_lazy_open_close_empty = ("iter", "__PP_TYPE__([", "])", "__PP_TYPE__([])")
+
+class _IterItems(list):
+    """ The items taken from a lazily formatted iterable. ``truncated`` will
+        be ``True`` if the iterable had more items. """
+    truncated = False
+
 class PrettyPrinter(object):
-    def __init__(self, indent=4, width=80, depth=None, stream=None):
+    def __init__(self, indent=4, width=80, depth=None, stream=None,
+                 most_common=None, max_iter_items=None, max_bytes=None,
+                 output=None, label_shared=False, compact=False):
         """Handle pretty printing operations onto a stream using a set of
         configured parameters.
 
@@ -287,13 +700,63 @@ class PrettyPrinter(object):
             The desired output stream.  If omitted (or false), the standard
             output stream available at construction will be used.
 
+        most_common
+            If set, ``Counter``s with more than this many items are
+            summarized by their ``most_common`` most common items (in order
+            of decreasing count), followed by ``...``.
+
+        max_iter_items
+            If set, iterators (including generators), mapping views (ex,
+            ``dict.keys()``), and ranges are formatted like lists (ex,
+            ``generator([1, 2, ...])``) showing at most this many items.
+            Only the items which are shown (plus one, to check whether there
+            are more) are taken from the iterable. Note that this means
+            iterators will be (partially) consumed. Files are iterators, but
+            are never formatted this way (that would read from them).
+
+        max_bytes
+            If set, only the first ``max_bytes`` bytes of ``bytes``,
+            ``bytearray``, and ``memoryview`` objects are shown, followed by
+            ``...``.
+
+        output
+            If ``"literal"`` or ``"json"``, objects are written on a single
+            line without any layout or whitespace, as a Python literal (ex,
+            ``{'a':[1,(2,)]}``) or as JSON (ex, ``{"a":[1,[2]]}``), so
+            ``pprint`` writes JSON Lines. Objects are sorted and recursion
+            is marked the same way as they are by default (in JSON, objects
+            which aren't containers or JSON scalars are written as a string
+            of their repr, and so are non-string keys). ``indent``,
+            ``width``, ``depth``, and the options above are ignored.
+
+        label_shared
+            If true, containers which appear more than once (ex, a list which
+            is an item of two other lists) are labelled the first time they
+            are written (ex, ``#1=[1, 2]``), and only the label (ex, ``#1``)
+            is written each time they appear after that, including where
+            they contain themselves. Shared containers are found by walking
+            the object before it's formatted. Ignored if ``output`` is
+            ``"json"``.
+
+        compact
+            Ignored; accepted for compatibility with ``pprint.PrettyPrinter``.
+
         """
-        self.get_default_state = lambda: PPrintState(
-            indent=int(indent),
-            max_width=int(width),
-            stream=stream or sys.stdout,
-            context={},
-        )
+        def get_default_state():
+            target = stream or sys.stdout
+            return PPrintState(
+                indent=int(indent),
+                max_width=int(width),
+                stream=target,
+                encoding=getattr(target, "encoding", None),
+                context={},
+                most_common=most_common,
+                max_iter_items=max_iter_items,
+                max_bytes=max_bytes,
+                output=output,
+                label_shared=label_shared,
+            )
+        self.get_default_state = get_default_state
         self.get_default_state().assert_sanity()
 
     def pprint(self, object, state=None):
@@ -302,12 +765,105 @@ class PrettyPrinter(object):
         state.write("\n")
 
     def pformat(self, object, state=None):
-        sio = TextIO()
+        sio = io.StringIO()
         state = state or self.get_default_state()
-        state = state.replace(stream=sio)
+        state = state.replace(stream=sio, encoding=_get_default_encoding())
         self._format(object, state)
         return sio.getvalue()
 
+    def saferepr(self, object, maxlen=None):
+        """Format a Python object on a single line, without any layout (so
+        ``indent`` and ``width`` are ignored), truncating the result if it
+        would be longer than ``maxlen`` characters."""
+        typ = type(object)
+        if typ in _simple_scalar_types or (
+            typ is TextType and
+            (maxlen is None or len(object) <= maxlen) and
+            _isascii(object)
+        ):
+            result = repr(object)
+        else:
+            sio = io.StringIO()
+            state = PPrintState(
+                indent=0,
+                max_width=sys.maxsize,
+                stream=sio,
+                context={},
+                oneline=True,
+            )
+            if maxlen is not None:
+                # Stop one character past the limit, so it's clear that the
+                # result needs to be truncated.
+                state.stream = TruncatingWriter(sio, maxlen + 1)
+            try:
+                self._saferepr_write(
+                    object, state, _text_writer(state.stream.write), 0,
+                )
+            except OutputTruncated:
+                pass
+            result = sio.getvalue()
+        if maxlen is not None and len(result) > maxlen:
+            result = result[:max(maxlen - 3, 0)] + "..."
+        return result
+
+    def _saferepr_write(self, object, state, write, depth):
+        """ Writes the single-line repr of ``object`` with ``write``.
+
+            Builtin scalars and (exact) lists, tuples, and dicts are handled
+            here using plain recursion, which is much cheaper than the general
+            engine's frames. Everything else, including anything nested more
+            than ``_saferepr_max_depth`` deep, is handed to the general engine
+            (which ``state`` has put in single-line mode). """
+        typ = type(object)
+        if typ in _simple_scalar_types:
+            write(repr(object))
+            return
+        if typ is BytesType:
+            write(repr(_clip_to_stream(object, state.stream)))
+            return
+        if typ is TextType:
+            write(_repr_text(_clip_to_stream(object, state.stream), None))
+            return
+        if (
+            typ not in _saferepr_container_types or
+            depth >= _saferepr_max_depth or
+            not object
+        ):
+            self._format(object, state)
+            return
+        objid = id(object)
+        if objid in state.context:
+            write(self._recursion(object, state))
+            return
+        state.context[objid] = 1
+        try:
+            first = True
+            if typ is dict:
+                write("{")
+                for k in _sorted(object):
+                    v = object[k]
+                    if first:
+                        first = False
+                    else:
+                        write(", ")
+                    self._saferepr_write(k, state, write, depth + 1)
+                    write(": ")
+                    self._saferepr_write(v, state, write, depth + 1)
+                write("}")
+                return
+            write(typ is list and "[" or "(")
+            for o in object:
+                if first:
+                    first = False
+                else:
+                    write(", ")
+                self._saferepr_write(o, state, write, depth + 1)
+            if typ is tuple and len(object) == 1:
+                write(", ")
+            write(typ is list and "]" or ")")
+        finally:
+            del state.context[objid]
+
     def isrecursive(self, object):
         state = self.get_default_state()
         self._format(object, state)
@@ -318,6 +874,18 @@ class PrettyPrinter(object):
         self._format(object, state)
         return state.s.readable and not state.s.recursive
 
+    def pprint_diff(self, a, b, state=None):
+        state = state or self.get_default_state()
+        for sign, path, has_value, value in self._iter_diff(a, b, "", set()):
+            self._write_diff_line(sign, path, has_value, value, state)
+
+    def pformat_diff(self, a, b, state=None):
+        sio = io.StringIO()
+        state = state or self.get_default_state()
+        state = state.replace(stream=sio, encoding=_get_default_encoding())
+        self.pprint_diff(a, b, state=state)
+        return sio.getvalue()[:-1]
+
     _open_close_empty = _mk_open_close_empty_dict([
         (dict, ("dict", "{", "}", "{}")),
         (list, ("list", "[", "]", "[]")),
@@ -329,59 +897,189 @@ class PrettyPrinter(object):
         (OrderedDict, ("odict", "__PP_TYPE__([", "])", "__PP_TYPE__()")),
     ])
 
+    def _get_open_close_empty(self, typ):
+        # Note: see comments on _mk_open_close_empty_dict for the rational
+        # behind looking up based first on type then on __repr__.
+        try:
+            return (
+                self._open_close_empty.get(typ) or
+                self._open_close_empty.get(typ.__repr__)
+            )
+        except TypeError:
+            # This will happen if the type or the __repr__ is unhashable.
+            # See: https://github.com/wolever/pprintpp/issues/18
+            return None
+
+    def _resolve_open_close_empty(self, object, typ, opener_closer_empty):
+        """ Returns ``(typeish, opener, closer, empty)`` for ``object``, given
+            the entry for its type from ``_open_close_empty`` (with
+            subclasses wrapped in, and ``__PP_TYPE__`` replaced with, the
+            name of their type). """
+        orig_type, typeish, opener, closer, empty = opener_closer_empty
+        if typ != orig_type:
+            if opener is not None and "__PP_TYPE__" not in opener:
+                opener = "__PP_TYPE__(" + opener
+                closer = closer + ")"
+            if empty is not None and "__PP_TYPE__" not in empty:
+                empty = "__PP_TYPE__(%s)" %(empty, )
+
+        if typ.__repr__ == defaultdict.__repr__:
+            factory_repr = object.default_factory
+            opener = "__PP_TYPE__(%r, {" %(factory_repr, )
+            empty = opener + closer
+
+        if "__PP_TYPE__" in opener:
+            opener = opener.replace("__PP_TYPE__", typ.__name__)
+        if "__PP_TYPE__" in empty:
+            empty = empty.replace("__PP_TYPE__", typ.__name__)
+        return typeish, opener, closer, empty
+
     def _format_nested_objects(self, object, state, typeish=None):
         objid = id(object)
         state.level += 1
         state.context[objid] = 1
         try:
+            if state.oneline:
+                # Layout is disabled entirely (see ``saferepr``)
+                yield self._write_nested_real(
+                    object, state, typeish, oneline=True,
+                )
+                return
             # First, try to fit everything on one line. For simplicity, assume
             # that it takes three characters to close the object (ex, `]),`)
-            oneline_state = state.clone(clone_shared=True)
-            oneline_state.stream = TextIO()
-            oneline_state.write_constrain = (
-                state.max_width - state.s.cur_line_length - 3
-            )
-            try:
-                self._write_nested_real(object, oneline_state, typeish,
-                                        oneline=True)
-                oneline_value = oneline_state.stream.getvalue()
-                if "\n" in oneline_value:
-                    oneline_value = None
-            except oneline_state.WriteConstrained:
-                oneline_value = None
+            available = state.max_width - state.s.cur_line_length - 3
+            if typeish == "most_common" or (
+                typeish == "iter" and object.truncated
+            ):
+                # The bounds don't account for the "..." which will be
+                # written after the items, so don't apply.
+                min_width, max_width = 0, None
+            else:
+                min_width, max_width = _oneline_width_bounds(
+                    object, typeish, available,
+                    depth_limited=bool(
+                        state.max_depth and state.level >= state.max_depth
+                    ),
+                )
+            if max_width is not None:
+                # Everything is guaranteed to fit, so there's no need to
+                # render to a scratch stream first.
+                yield self._write_nested_real(
+                    object, state, typeish, oneline=True,
+                )
+                return
+            if state.write_constrain is not None:
+                # We're already part of a one-line trial, and if this object
+                # doesn't fit on one line then neither will the object being
+                # tried, so there's no need to render to a separate scratch
+                # stream: check that the items fit in the space available
+                # here, then that the whole line fits in the space which was
+                # available to the trial.
+                if min_width > available:
+                    raise state.WriteConstrained
+                trial_available = state.write_constrain
+                start = state.s.cur_line_length
+                state.write_constrain = available
+                yield self._write_nested_real(
+                    object, state, typeish, oneline=True,
+                )
+                if state.s.cur_line_length - start > trial_available:
+                    raise state.WriteConstrained
+                return
+            oneline_value = None
+            label_count = state.s.shared is not None and len(state.s.labelled)
+            if min_width <= available:
+                # Every frame removes itself from the context as it exits
+                # (even if the trial is abandoned), so the context can be
+                # shared instead of copied.
+                oneline_state = state.replace(
+                    stream=io.StringIO(),
+                    write_constrain=available,
+                    context=state.context,
+                )
+                oneline_state.s = state.s.clone()
+                try:
+                    yield self._write_nested_real(object, oneline_state,
+                                                  typeish, oneline=True)
+                    oneline_value = oneline_state.stream.getvalue()
+                    if "\n" in oneline_value:
+                        oneline_value = None
+                except oneline_state.WriteConstrained:
+                    pass
             if oneline_value is not None:
                 state.write(oneline_value)
+                state.s.recursive = oneline_state.s.recursive
+                state.s.readable = oneline_state.s.readable
                 return
+            if state.s.shared is not None:
+                # The object will be written again, so labels given by the
+                # abandoned trial have to be given again.
+                self._forget_labels(state, label_count)
             state.write("\n" + state.get_indent_string())
-            self._write_nested_real(object, state, typeish)
+            yield self._write_nested_real(object, state, typeish)
         finally:
             state.level -= 1
+            del state.context[objid]
         state.write(state.get_indent_string())
 
     def _write_nested_real(self, object, state, typeish, oneline=False):
         indent_str = state.get_indent_string()
         first = True
         joiner = oneline and ", " or ",\n" + indent_str
-        if typeish == "dict":
-            for k, v in _sorted(object.items()):
+        write = state.write
+        # Builtin numbers and constants are written directly, rather than
+        # paying for a frame each (unless they need to be elided by the
+        # depth limit).
+        simple_types = (
+            not (state.max_depth and state.level >= state.max_depth) and
+            _simple_scalar_types or
+            ()
+        )
+        if typeish in ("dict", "most_common"):
+            if typeish == "dict":
+                # Only the keys are sorted (and values are looked up as
+                # they're written), so huge mappings aren't copied into a
+                # list of item tuples. ``dict.__getitem__`` is used so that
+                # ``__missing__`` can't be triggered.
+                getitem = dict.__getitem__
+                items = ((k, getitem(object, k)) for k in _sorted(object))
+            else:
+                items = object.most_common(state.most_common)
+            for k, v in items:
                 if first:
                     first = False
                 else:
-                    state.write(joiner)
-                self._format(k, state)
-                state.write(": ")
-                self._format(v, state)
+                    write(joiner)
+                if type(k) in simple_types:
+                    write(repr(k))
+                else:
+                    yield self._iter_format(k, state)
+                write(": ")
+                if type(v) in simple_types:
+                    write(repr(v))
+                else:
+                    yield self._iter_format(v, state)
+            if typeish == "most_common":
+                if not first:
+                    write(joiner)
+                write("...")
         elif typeish == "odict":
             for k, v in _iteritems(object):
                 if first:
                     first = False
                 else:
-                    state.write(joiner)
-                state.write("(")
-                self._format(k, state)
-                state.write(", ")
-                self._format(v, state)
-                state.write(")")
+                    write(joiner)
+                write("(")
+                if type(k) in simple_types:
+                    write(repr(k))
+                else:
+                    yield self._iter_format(k, state)
+                write(", ")
+                if type(v) in simple_types:
+                    write(repr(v))
+                else:
+                    yield self._iter_format(v, state)
+                write(")")
         else:
             if typeish == "set":
                 object = _sorted(object)
@@ -389,103 +1087,502 @@ class PrettyPrinter(object):
                 if first:
                     first = False
                 else:
-                    state.write(joiner)
-                self._format(o, state)
+                    write(joiner)
+                if type(o) in simple_types:
+                    write(repr(o))
+                else:
+                    yield self._iter_format(o, state)
+            if typeish == "iter" and object.truncated:
+                write(joiner)
+                write("...")
         if oneline and typeish == "tuple" and len(object) == 1:
             state.write(", ")
         elif not oneline:
             state.write(",\n")
 
+    def _write_text(self, object, state):
+        """ Writes the string ``object`` as a literal.
+
+            If the literal fits on neither the current line nor a line of its
+            own, it's split into chunks which do (preferably after a space),
+            one per line, which are implicitly concatenated inside
+            parentheses. """
+        write = state.write
+        if state.write_constrain is not None:
+            # The literal will be at least this long, so there's no need to
+            # build it to know that it won't fit in a one-line trial.
+            if len(object) + 2 > state.write_constrain:
+                raise state.WriteConstrained
+            write(_repr_text(object, state.encoding))
+            return
+        object = _clip_to_stream(object, state.stream)
+        literal = _repr_text(object, state.encoding)
+        if (
+            state.oneline or
+            len(literal) <= state.max_width - state.s.cur_line_length - 1
+        ):
+            write(literal)
+            return
+
+        state.level += 1
+        indent_str = state.get_indent_string()
+        state.level -= 1
+        quote = literal[-1]
+        prefix = literal[:literal.index(quote) + 1]
+        target = max(state.max_width - len(indent_str) - len(prefix) - 1, 10)
+        content = literal[len(prefix):-1]
+        content_len = len(content)
+        if content_len <= target:
+            write(literal)
+            return
+
+        lines = []
+        start = 0
+        while start < content_len:
+            end = start + target
+            if end < content_len:
+                # Prefer to split after a newline, then after a space
+                newline = content.rfind("\\n", start, end - 1)
+                space = content.rfind(" ", start + target // 2, end)
+                if newline >= 0 and _is_escape_start(content, start, newline):
+                    end = newline + 2
+                elif space >= 0:
+                    end = space + 1
+                else:
+                    end = _escape_boundary(content, start, end)
+            lines.append(prefix + content[start:end] + quote)
+            start = end
+        write("(\n" + indent_str)
+        write(("\n" + indent_str).join(lines))
+        write("\n" + state.get_indent_string() + ")")
+
+    def _write_bytes(self, view, state, name=None):
+        """ Writes the bytes in the ``memoryview`` ``view`` as a bytes literal
+            (wrapped in ``name(...)``, if ``name`` is given).
+
+            If the literal won't fit on the current line it's split into
+            chunks which do, one per line, which are implicitly concatenated
+            inside parentheses. Only one block of ``view`` (see
+            ``_bytes_block_size``) is copied at a time. """
+        write = state.write
+        length = len(view)
+        truncated = state.max_bytes is not None and length > state.max_bytes
+        ellipsis = ""
+        if truncated:
+            view = view[:state.max_bytes]
+            length = state.max_bytes
+            ellipsis = "..."
+            state.s.readable = False
+        view = _clip_to_stream(view, state.stream)
+        length = len(view)
+        opener = name and name + "(" or ""
+        closer = name and ")" or ""
+        available = (
+            state.max_width - state.s.cur_line_length -
+            len(opener) - len(closer) - len(ellipsis) - 1
+        )
+        state.level += 1
+        indent_str = state.get_indent_string()
+        state.level -= 1
+        overhead = _empty_bytes_repr_len
+        target = max(state.max_width - len(indent_str) - overhead, 4)
+
+        # Literals are only split if they fit on neither the current line
+        # nor a line of their own (and empty literals can't be split). Every
+        # byte takes at least one character, so there's no need to repr the
+        # bytes to know that they won't fit.
+        force_oneline = state.oneline or not length
+        if force_oneline or length <= max(available, target):
+            literal = repr(view.tobytes())
+            if (
+                force_oneline or
+                len(literal) <= available or
+                len(literal) - overhead <= target
+            ):
+                write(opener + literal + ellipsis + closer)
+                return
+
+        write(opener or "(")
+        write("\n")
+        line_sep = "\n" + indent_str
+        lines = []
+        # Blocks of bytes are repr'd at once, and the repr is then cut into
+        # lines (taking care not to cut through an escape sequence), which is
+        # much faster than repr'ing each line separately.
+        prefix_len = overhead - 1
+        for block_start in range(0, length, _bytes_block_size):
+            literal = repr(
+                view[block_start:block_start + _bytes_block_size].tobytes()
+            )
+            # Note: the whole block uses the same quote, so every line taken
+            # from it is a valid literal with that quote.
+            prefix = literal[:prefix_len]
+            quote = literal[-1]
+            content = literal[prefix_len:-1]
+            content_len = len(content)
+            start = 0
+            while start < content_len:
+                end = start + target
+                if end < content_len:
+                    end = _escape_boundary(content, start, end)
+                lines.append(prefix + content[start:end] + quote)
+                start = end
+                if len(lines) >= 1024:
+                    write(indent_str + line_sep.join(lines) + "\n")
+                    lines = []
+        if lines:
+            write(indent_str + line_sep.join(lines) + "\n")
+        if truncated:
+            write(indent_str + ellipsis + "\n")
+        write(state.get_indent_string() + ")")
+
+    def _get_iter_items(self, object, state):
+        """ Returns the first ``state.max_iter_items`` items of the iterable
+            ``object`` (see ``_IterItems``), taking at most one more item than
+            that from it.
+
+            The items are remembered in the shared state, because an iterable
+            can be formatted more than once (ex, by a one-line trial), but an
+            iterator can only be consumed once. """
+        objid = id(object)
+        cached = state.s.iter_items.get(objid)
+        if cached is not None:
+            return cached[1]
+        limit = state.max_iter_items
+        items = _IterItems(itertools.islice(object, limit + 1))
+        if len(items) > limit:
+            del items[limit:]
+            items.truncated = True
+        # Keep a reference to the iterable so its id can't be reused
+        state.s.iter_items[objid] = (object, items)
+        return items
+
     def _format(self, object, state):
+        if state.label_shared and state.output != "json":
+            state.s.shared = self._find_shared(object) or None
+            state.s.labels = {}
+            state.s.labelled = []
+        if state.output is not None:
+            self._format_compact(object, state)
+            return
+        self._run_frames([self._iter_format(object, state)])
+
+    def _find_shared(self, object):
+        """ Returns the set of ids of the (non-empty) containers which can be
+            reached from ``object`` more than once (see ``label_shared``).
+
+            Each container's items are only visited the first time it's
+            reached, and nothing is formatted, so this is much cheaper than
+            formatting ``object``. Lazily formatted iterables aren't visited,
+            as that would consume them. """
+        shared = set()
+        if self._get_open_close_empty(type(object)) is None:
+            return shared
+        is_container = {}
+        seen = set()
+        stack = [object]
+        while stack:
+            object = stack.pop()
+            if not len(object):
+                continue
+            objid = id(object)
+            if objid in seen:
+                shared.add(objid)
+                continue
+            seen.add(objid)
+            if isinstance(object, (dict, OrderedDict)):
+                object = itertools.chain.from_iterable(_iteritems(object))
+            for item in object:
+                typ = type(item)
+                container = is_container.get(typ)
+                if container is None:
+                    container = is_container[typ] = (
+                        self._get_open_close_empty(typ) is not None
+                    )
+                if container:
+                    stack.append(item)
+        return shared
+
+    def _label(self, objid, state):
+        """ Returns the label for the shared container with id ``objid``: if
+            it has already been labelled, ``#n`` (which should be written
+            instead of the container), otherwise the new label ``#n=``
+            (which should be written before it). """
+        state.s.readable = False
+        label = state.s.labels.get(objid)
+        if label is not None:
+            if objid in state.context:
+                state.s.recursive = True
+            return "#%s" %(label, )
+        labelled = state.s.labelled
+        labelled.append(objid)
+        state.s.labels[objid] = len(labelled)
+        return "#%s=" %(len(labelled), )
+
+    def _forget_labels(self, state, count):
+        """ Forgets all but the first ``count`` labels. """
+        labelled = state.s.labelled
+        while len(labelled) > count:
+            del state.s.labels[labelled.pop()]
+
+    def _format_compact(self, object, state):
+        if state.output == "json" and _is_plain_json(object):
+            # ``json``'s (C) encoder gives the same result much faster
+            state.write(_json_encoder.encode(object))
+            return
+        self._run_frames([self._iter_compact(object, state)])
+
+    def _iter_compact(self, object, state):
+        """ Writes ``object`` in the format given by ``state.output`` (see
+            the ``output`` argument to ``PrettyPrinter``). Like
+            ``_iter_format``, this yields a frame for each nested container.
+        """
+        # Line lengths don't matter here, so write straight to the stream
+        write = _text_writer(state.stream.write)
+        is_json = state.output == "json"
+        typ = type(object)
+        opener_closer_empty = self._get_open_close_empty(typ)
+        if opener_closer_empty is None:
+            write(self._compact_scalar(object, state, is_json))
+            return
+        objid = id(object)
+        if state.s.shared is not None and objid in state.s.shared:
+            label = self._label(objid, state)
+            write(label)
+            if not label.endswith("="):
+                return
+        if objid in state.context:
+            marker = self._recursion(object, state)
+            write(is_json and _json_string(marker) or marker)
+            return
+
+        typeish, opener, closer, empty = self._resolve_open_close_empty(
+            object, typ, opener_closer_empty,
+        )
+        if is_json:
+            if typeish in ("dict", "odict"):
+                opener, closer, empty = "{", "}", "{}"
+            else:
+                opener, closer, empty = "[", "]", "[]"
+        if not len(object):
+            write(empty)
+            return
+
+        if typeish == "dict":
+            getitem = dict.__getitem__
+            items = ((k, getitem(object, k)) for k in _sorted(object))
+        elif typeish == "odict":
+            items = _iteritems(object)
+        elif typeish == "set":
+            items = _sorted(object)
+        else:
+            items = object
+        scalars = is_json and _json_scalars or _literal_scalars
+        state.context[objid] = 1
+        try:
+            write(opener)
+            first = True
+            for item in items:
+                if first:
+                    first = False
+                else:
+                    write(",")
+                if typeish in ("dict", "odict"):
+                    k, item = item
+                    if is_json:
+                        write(self._compact_json_key(k, state))
+                        write(":")
+                    else:
+                        if typeish == "odict":
+                            write("(")
+                        if type(k) in scalars:
+                            write(scalars[type(k)](k))
+                        else:
+                            yield self._iter_compact(k, state)
+                        write(typeish == "odict" and "," or ":")
+                if type(item) in scalars:
+                    write(scalars[type(item)](item))
+                else:
+                    yield self._iter_compact(item, state)
+                if typeish == "odict" and not is_json:
+                    write(")")
+            if typeish == "tuple" and len(object) == 1 and not is_json:
+                write(",")
+        finally:
+            del state.context[objid]
+        write(closer)
+
+    def _compact_scalar(self, object, state, is_json):
+        typ = type(object)
+        if is_json:
+            if typ in _json_scalars:
+                return _json_scalars[typ](object)
+            if isinstance(object, TextType):
+                return _json_string(object)
+            state.s.readable = False
+            return _json_string(self.saferepr(object))
+        if typ in _literal_scalars:
+            return _literal_scalars[typ](object)
+        if typ.__repr__ == TextType.__repr__:
+            return _repr_text(object, state.encoding)
+        orepr = self.saferepr(object)
+        state.s.readable = state.s.readable and not orepr.startswith("<")
+        return orepr
+
+    def _compact_json_key(self, key, state):
+        """ Returns ``key`` as a JSON string (which is how ``json`` converts
+            numbers, booleans, and ``None``; anything else is converted to
+            its compact Python literal). """
+        typ = type(key)
+        if typ in _json_strings:
+            return _json_string(key)
+        if typ in _json_scalars:
+            return _json_string(_json_scalars[typ](key))
+        sio = io.StringIO()
+        self._run_frames([self._iter_compact(key, state.replace(
+            stream=sio,
+            output="literal",
+            context=state.context,
+        ))])
+        return _json_string(sio.getvalue())
+
+    def _run_frames(self, stack, max_frames=None):
+        """ Runs the frames (generators, usually from ``_iter_format``) on
+            ``stack`` until it is empty or ``max_frames`` new frames have been
+            started, whichever comes first.
+
+            Rather than recursing, frames yield the frames they depend on (ex,
+            ``yield self._iter_format(child, state)``), which are pushed onto
+            the stack and run before the yielding frame is resumed. This keeps
+            the Python stack flat, so objects can be nested arbitrarily deeply.
+            Exceptions propagate down the stack, so (for example) a
+            ``WriteConstrained`` raised while formatting a deeply nested
+            object is thrown into the frame which started the one-line trial.
+
+            Because the stack is left in place when ``max_frames`` is reached,
+            formatting can be suspended and resumed (see ``pprintpp.aio``). """
+        push = stack.append
+        pop = stack.pop
+        top = stack[-1]
+        exc = None
+        while True:
+            try:
+                if exc is None:
+                    child = next(top)
+                else:
+                    child = top.throw(exc)
+                    exc = None
+            except StopIteration:
+                pop()
+                if not stack:
+                    return
+                top = stack[-1]
+                continue
+            except Exception as e:
+                pop()
+                if not stack:
+                    raise
+                top = stack[-1]
+                exc = e
+                continue
+            push(child)
+            top = child
+            if max_frames is not None:
+                max_frames -= 1
+                if max_frames <= 0:
+                    return
+
+    def _iter_format(self, object, state):
         write = state.write
         if state.max_depth and state.level >= state.max_depth:
             write("...")
             return
-        state = state.clone()
         objid = id(object)
+        if state.s.shared is not None and objid in state.s.shared:
+            label = self._label(objid, state)
+            write(label)
+            if not label.endswith("="):
+                return
         if objid in state.context:
             write(self._recursion(object, state))
             return
 
         typ = type(object)
         r = typ.__repr__
-        # Note: see comments on _mk_open_close_empty_dict for the rational
-        # behind looking up based first on type then on __repr__.
-        try:
-            opener_closer_empty = (
-                self._open_close_empty.get(typ) or
-                self._open_close_empty.get(r)
-            )
-        except TypeError:
-            # This will happen if the type or the __repr__ is unhashable.
-            # See: https://github.com/wolever/pprintpp/issues/18
-            opener_closer_empty = None
-
+        opener_closer_empty = self._get_open_close_empty(typ)
+        if (
+            opener_closer_empty is None and
+            state.max_iter_items is not None and
+            isinstance(object, _lazy_iterable_types) and
+            not isinstance(object, _not_lazy_iterable_types)
+        ):
+            # The output can't be evaluated to re-create the iterable
+            state.s.readable = False
+            opener_closer_empty = (typ, ) + _lazy_open_close_empty
+            items = self._get_iter_items(object, state)
+            if id(items) in state.context:
+                # The items are formatted in place of the iterable (so
+                # they're what is in the context), and the same items are
+                # returned each time the iterable is formatted.
+                write(self._recursion(object, state))
+                return
+            object = items
         if opener_closer_empty is not None:
-            orig_type, typeish, opener, closer, empty = opener_closer_empty
-            if typ != orig_type:
-                if opener is not None and "__PP_TYPE__" not in opener:
-                    opener = "__PP_TYPE__(" + opener
-                    closer = closer + ")"
-                if empty is not None and "__PP_TYPE__" not in empty:
-                    empty = "__PP_TYPE__(%s)" %(empty, )
-
-            if r == defaultdict.__repr__:
-                factory_repr = object.default_factory
-                opener = "__PP_TYPE__(%r, {" %(factory_repr, )
-                empty = opener + closer
-
+            typeish, opener, closer, empty = self._resolve_open_close_empty(
+                object, typ, opener_closer_empty,
+            )
             length = len(object)
+            if (
+                typeish == "dict" and
+                state.most_common is not None and
+                length > state.most_common and
+                isinstance(object, Counter)
+            ):
+                typeish = "most_common"
             if length == 0:
-                if "__PP_TYPE__" in empty:
-                    empty = empty.replace("__PP_TYPE__", typ.__name__)
                 write(empty)
                 return
 
-            if "__PP_TYPE__" in opener:
-                opener = opener.replace("__PP_TYPE__", typ.__name__)
+            constrain = state.write_constrain
             write(opener)
-            self._format_nested_objects(object, state, typeish=typeish)
+            if constrain is None:
+                yield self._format_nested_objects(object, state, typeish)
+            else:
+                # When trying to fit a container on one line, the contents of
+                # nested containers are checked against the space which was
+                # available before the container's opener, but aren't counted
+                # against the space available to their siblings (each nested
+                # container has already checked that it fits, given its
+                # position on the line).
+                after_opener = state.write_constrain
+                state.write_constrain = constrain
+                yield self._format_nested_objects(object, state, typeish)
+                state.write_constrain = after_opener
             write(closer)
             return
 
-        if r == BytesType.__repr__:
-            write(repr(object))
+        if _memoryview is not None and r == BytesType.__repr__:
+            self._write_bytes(_memoryview(object), state)
             return
 
-        if r == TextType.__repr__:
-            if _isascii(object):  # Optimalization
-                write(repr(object))
+        if _memoryview is not None and (
+            r == bytearray.__repr__ or r == _memoryview.__repr__
+        ):
+            view = _byte_view(object)
+            if view is not None:
+                self._write_bytes(view, state, typ.__name__)
                 return
-            if "'" in object and '"' not in object:
-                quote = '"'
-                quotes = {'"': '\\"'}
-            else:
-                quote = "'"
-                quotes = {"'": "\\'"}
-            qget = quotes.get
-            ascii_table_get = ascii_table.get
-            unicat_get = unicodedata.category
-            write(u_prefix + quote)
-            for char in object:
-                if ord(char) > 0x7F:
-                    cat = unicat_get(char)
-                    if unicode_printable_categories.get(cat):
-                        try:
-                            write(char)
-                            continue
-                        except UnicodeEncodeError:
-                            pass
-                write(
-                    qget(char) or
-                    ascii_table_get(char) or
-                    chr_to_ascii(char)
-                )
-            write(quote)
+
+        if r == TextType.__repr__:
+            self._write_text(object, state)
             return
 
         orepr = repr(object)
-        orepr = orepr.replace("\n", "\n" + state.get_indent_string())
+        if "\n" in orepr:
+            orepr = orepr.replace(
+                "\n",
+                state.oneline and "\\n" or "\n" + state.get_indent_string(),
+            )
         state.s.readable = (
             state.s.readable and
             not orepr.startswith("<")
@@ -516,6 +1613,437 @@ class PrettyPrinter(object):
         return ("<Recursion on %s with id=%s>"
                 % (type(object).__name__, id(object)))
 
+    def _write_diff_line(self, sign, path, has_value, value, state):
+        prefix = sign + " " + path
+        if not has_value:
+            state.write(prefix + "\n")
+            return
+        if path:
+            prefix += ": "
+        state.write(prefix)
+        # Continuation lines are indented by two spaces so they line up
+        # with the path, rather than the sign.
+        value_state = state.replace(
+            stream=io.StringIO(),
+            max_width=state.max_width - 2,
+        )
+        self._format(value, value_state)
+        state.write(value_state.stream.getvalue().replace("\n", "\n  "))
+        state.write("\n")
+
+    def _diff_key(self, key):
+        key_state = self.get_default_state()
+        key_state = key_state.replace(stream=io.StringIO(), max_width=sys.maxsize)
+        self._format(key, key_state)
+        return key_state.stream.getvalue()
+
+    def _iter_diff(self, a, b, path, context):
+        """ Walks ``a`` and ``b`` in the same order they would be printed in,
+            yielding ``(sign, path, has_value, value)`` for each difference.
+
+            Subtrees which are identical, or equal and of the same type, are
+            skipped without being formatted or walked (note that this means
+            equal subtrees are skipped even if their items' types differ, ex,
+            ``[1]`` and ``[1.0]``), and dict keys are only sorted after the
+            unchanged keys have been discarded, so the cost is proportional to
+            the size of the difference rather than the size of the inputs.
+
+            Like ``_run_frames``, the walk uses a stack of frames (see
+            ``_iter_diff_frame``) rather than recursion, so objects can be
+            nested arbitrarily deeply. """
+        stack = [self._iter_diff_frame(a, b, path, context)]
+        while stack:
+            try:
+                item = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                continue
+            if type(item) is tuple:
+                yield item
+            else:
+                stack.append(item)
+
+    def _iter_diff_frame(self, a, b, path, context):
+        """ Yields the differences between ``a`` and ``b`` (see
+            ``_iter_diff``), and a frame for each pair of nested containers
+            which need to be compared. """
+        if _diff_same(a, b):
+            return
+
+        typ = type(a)
+        opener_closer_empty = (
+            typ is type(b) and
+            self._get_open_close_empty(typ)
+        )
+        pair_id = (id(a), id(b))
+        if not opener_closer_empty or pair_id in context:
+            yield ("-", path, True, a)
+            yield ("+", path, True, b)
+            return
+
+        typeish = opener_closer_empty[1]
+        if typeish in ("dict", "odict"):
+            if (
+                getattr(a, "default_factory", None) !=
+                getattr(b, "default_factory", None)
+            ):
+                yield ("-", path, True, a)
+                yield ("+", path, True, b)
+                return
+            if typeish == "odict" and list(a) != list(b):
+                # The order of an OrderedDict's keys is significant, and
+                # there's no compact way to describe re-ordered keys.
+                yield ("-", path, True, a)
+                yield ("+", path, True, b)
+                return
+            keys = [
+                k for k in a
+                if k not in b or not _diff_same(a[k], b[k])
+            ]
+            keys.extend(k for k in b if k not in a)
+            if typeish == "dict":
+                keys = _sorted(keys)
+            context.add(pair_id)
+            for k in keys:
+                key_path = "%s[%s]" %(path, self._diff_key(k))
+                if k not in b:
+                    yield ("-", key_path, True, a[k])
+                elif k not in a:
+                    yield ("+", key_path, True, b[k])
+                else:
+                    yield self._iter_diff_frame(a[k], b[k], key_path, context)
+            context.discard(pair_id)
+            return
+
+        if typeish == "set":
+            for sign, items in (("-", a - b), ("+", b - a)):
+                for item in _sorted(items):
+                    yield (sign, "%s{%s}" %(path, self._diff_key(item)), False, None)
+            return
+
+        # Lists and tuples: trim the common prefix and suffix, then compare
+        # the remaining items pairwise if there are the same number of them,
+        # otherwise report them as removed and added.
+        start = 0
+        end_a = len(a)
+        end_b = len(b)
+        while start < end_a and start < end_b and _diff_same(a[start], b[start]):
+            start += 1
+        while (
+            end_a > start and end_b > start and
+            _diff_same(a[end_a - 1], b[end_b - 1])
+        ):
+            end_a -= 1
+            end_b -= 1
+        context.add(pair_id)
+        if end_a - start == end_b - start:
+            for idx in range(start, end_a):
+                item_path = "%s[%s]" %(path, idx)
+                yield self._iter_diff_frame(a[idx], b[idx], item_path, context)
+        else:
+            for idx in range(start, end_a):
+                yield ("-", "%s[%s]" %(path, idx), True, a[idx])
+            for idx in range(start, end_b):
+                yield ("+", "%s[%s]" %(path, idx), True, b[idx])
+        context.discard(pair_id)
+
+
+
+# Types whose instances are immutable, so two of them can be compared by value
+# (rather than by identity) when checking whether a container has changed.
+_immutable_scalar_types = frozenset(
+    (type(None), bool, float, TextType, BytesType) + _int_types
+)
+
+def _snapshot_container(object):
+    """ Returns a shallow snapshot of everything which contributes to the repr
+        of the container ``object``: its type, its ``default_factory`` (for
+        ``defaultdict``), and its items (flattened, for mappings). """
+    if isinstance(object, dict):
+        return (
+            (type(object), getattr(object, "default_factory", None)) +
+            tuple(itertools.chain.from_iterable(_iteritems(object)))
+        )
+    return (type(object), None) + tuple(object)
+
+def _snapshots_match(old, new):
+    if len(old) != len(new):
+        return False
+    for a, b in zip(old, new):
+        if a is b:
+            continue
+        typ = type(a)
+        if typ is type(b) and typ in _immutable_scalar_types and a == b:
+            continue
+        return False
+    return True
+
+_saferepr_printer = PrettyPrinter()
+_saferepr_container_types = frozenset((dict, list, tuple))
+_saferepr_max_depth = 100
+
+class _RenderCapture(object):
+    """ The text of the outermost container being rendered by an
+        ``IncrementalPrettyPrinter``, which the containers nested inside it
+        are written straight into (so each of their renderings is stored as
+        offsets into this text, rather than as a copy). """
+
+    def __init__(self):
+        self.stream = io.StringIO()
+        # ``(key, start, end, readable, child_keys)`` for each rendering
+        self.renders = []
+        # ``(key, start)`` for the renderings directly inside each container
+        # being rendered
+        self.child_keys = [[]]
+
+
+class IncrementalPrettyPrinter(PrettyPrinter):
+    """ A ``PrettyPrinter`` for objects which change only slightly between
+        calls to ``pformat`` (or ``pprint``).
+
+        The rendering of every container written during one call is
+        remembered (as offsets into the text of the outermost container),
+        along with a shallow snapshot of its items, and reused on the next
+        call if the container (and every container it contains) is unchanged
+        and appears at the same position. Changes are detected by comparing
+        snapshots (by identity, or by value for immutable scalars), which is
+        much cheaper than formatting. The output is always identical to
+        ``PrettyPrinter.pformat``.
+
+        Only containers seen during the most recent call are remembered;
+        ``reset()`` discards everything. """
+
+    def __init__(self, *args, **kwargs):
+        PrettyPrinter.__init__(self, *args, **kwargs)
+        self.reset()
+
+    def reset(self):
+        # id(container) -> (container, snapshot)
+        self._snapshots = {}
+        # (id(container), level, column, encoding) ->
+        #     (text, start, end, readable, child_keys)
+        # where ``text[start:end]`` is the rendering, and ``child_keys`` are
+        # ``(key, offset)`` for the renderings of the containers directly
+        # inside it.
+        self._renders = {}
+        # The state of the call currently in progress: the renderings which
+        # will be kept for the next call, whether each container is unchanged
+        # since its last snapshot, the ids of all containers seen, and the
+        # outermost container being rendered (see ``_RenderCapture``).
+        self._next_renders = None
+        self._unchanged = None
+        self._live = None
+        self._capture = None
+
+    def pprint(self, object, state=None):
+        self._begin_pass()
+        try:
+            return PrettyPrinter.pprint(self, object, state=state)
+        finally:
+            self._end_pass()
+
+    def pformat(self, object, state=None):
+        self._begin_pass()
+        try:
+            return PrettyPrinter.pformat(self, object, state=state)
+        finally:
+            self._end_pass()
+
+    def _begin_pass(self):
+        self._next_renders = {}
+        self._unchanged = {}
+        self._live = set()
+
+    def _end_pass(self):
+        # Forget everything which wasn't part of this pass, both to avoid
+        # keeping dead objects alive and to keep the caches from growing
+        # without bound.
+        live = self._live
+        self._snapshots = dict(
+            (objid, snapshot) for (objid, snapshot) in _iteritems(self._snapshots)
+            if objid in live
+        )
+        self._renders = self._next_renders
+        self._next_renders = self._unchanged = self._live = None
+        self._capture = None
+
+    def _is_unchanged(self, object):
+        """ Returns ``True`` if neither ``object`` nor any container it
+            contains have changed since they were last snapshotted (see
+            ``_iter_unchanged``). """
+        unchanged = self._unchanged.get(id(object))
+        if unchanged is None:
+            self._run_frames([self._iter_unchanged(object)])
+            unchanged = self._unchanged[id(object)]
+        return unchanged
+
+    def _iter_unchanged(self, object):
+        """ Records whether ``object`` is unchanged in ``self._unchanged``,
+            yielding a frame (see ``_run_frames``) for each container it
+            contains which hasn't been checked yet.
+
+            Items which are neither immutable scalars nor containers (ex, a
+            ``bytearray`` or an object with a custom ``__repr__``) could have
+            changed without their identity changing, so containers which
+            contain them are always considered changed. """
+        objid = id(object)
+        old = self._snapshots.get(objid)
+        if old is None or old[0] is not object:
+            self._unchanged[objid] = False
+            return
+        # Assume that the object is unchanged while checking its children so
+        # cycles terminate. This is safe because a container which is part of
+        # a cycle will always be rendered with a recursion marker, so its
+        # rendering is never cached.
+        self._unchanged[objid] = True
+        new = _snapshot_container(object)
+        unchanged = _snapshots_match(old[1], new)
+        for child in (unchanged and new[2:] or ()):
+            typ = type(child)
+            if typ in _immutable_scalar_types:
+                continue
+            if self._get_open_close_empty(typ) is None:
+                unchanged = False
+                break
+            child_unchanged = self._unchanged.get(id(child))
+            if child_unchanged is None:
+                yield self._iter_unchanged(child)
+                child_unchanged = self._unchanged[id(child)]
+            if not child_unchanged:
+                unchanged = False
+                break
+        self._unchanged[objid] = unchanged
+        if unchanged:
+            self._live.add(objid)
+
+    def _reuse_render(self, key, render, state):
+        """ Writes the cached ``render``, and keeps it (and the renderings
+            inside it, which are still valid) for the next call. """
+        text, start, end, readable, child_keys = render
+        capture = self._capture
+        if capture is None:
+            state.write(text[start:end])
+            keys = [key]
+            while keys:
+                key = keys.pop()
+                render = self._renders.get(key)
+                if render is not None:
+                    self._next_renders[key] = render
+                    keys.extend(child_key for (child_key, _) in render[4])
+        else:
+            # The renderings are moved to the rendering's new position in the
+            # capture's text. Each child's position is taken from its parent
+            # (the same container can be rendered in more than one place, in
+            # which case its own entry will refer to only one of them).
+            position = capture.stream.tell()
+            state.write(text[start:end])
+            capture.child_keys[-1].append((key, position))
+            renders = [(key, position)]
+            while renders:
+                key, position = renders.pop()
+                render = self._renders.get(key)
+                if render is not None:
+                    _, start, end, render_readable, child_keys = render
+                    capture.renders.append((
+                        key, position, position + end - start,
+                        render_readable, child_keys,
+                    ))
+                    renders.extend(
+                        (child_key, position + offset)
+                        for (child_key, offset) in child_keys
+                    )
+        state.s.readable = state.s.readable and readable
+
+    def _iter_format(self, object, state):
+        objid = id(object)
+        if (
+            self._unchanged is None or
+            objid in state.context or
+            # Labels depend on everything written before the container
+            state.s.shared is not None or
+            state.oneline or
+            (state.max_depth and state.level >= state.max_depth) or
+            self._get_open_close_empty(type(object)) is None
+        ):
+            yield PrettyPrinter._iter_format(self, object, state)
+            return
+
+        key = (objid, state.level, state.s.cur_line_length, state.encoding)
+        render = self._renders.get(key)
+        if (
+            render is not None and
+            state.write_constrain is None and
+            self._is_unchanged(object)
+        ):
+            self._reuse_render(key, render, state)
+            return
+
+        # The object may also appear elsewhere (ex, at another position),
+        # where a rendering made from its previous snapshot could be reused,
+        # so whether it has changed is recorded before the snapshot is
+        # replaced. Note that the object is never marked as unchanged here:
+        # the containers it contains may still have changed.
+        old = self._snapshots.get(objid)
+        new = _snapshot_container(object)
+        if (
+            old is None or
+            old[0] is not object or
+            not _snapshots_match(old[1], new)
+        ):
+            self._unchanged[objid] = False
+        self._snapshots[objid] = (object, new)
+        self._live.add(objid)
+        if state.write_constrain is not None:
+            # Don't bother with the cache during one-line trials: they are
+            # cheap, and frequently abandoned part way through.
+            yield PrettyPrinter._iter_format(self, object, state)
+            return
+
+        capture = self._capture
+        outermost = capture is None
+        if outermost:
+            capture = self._capture = _RenderCapture()
+            sub_state = state.replace(
+                stream=capture.stream,
+                context=state.context,
+            )
+            sub_state.s = state.s.clone()
+        else:
+            sub_state = state
+        recursive = sub_state.s.recursive
+        readable = sub_state.s.readable
+        sub_state.s.recursive = False
+        sub_state.s.readable = True
+        start = capture.stream.tell()
+        capture.child_keys.append([])
+        try:
+            yield PrettyPrinter._iter_format(self, object, sub_state)
+        finally:
+            if outermost:
+                self._capture = None
+        child_keys = [
+            (child_key, child_start - start)
+            for (child_key, child_start) in capture.child_keys.pop()
+        ]
+        sub_recursive = sub_state.s.recursive
+        sub_readable = sub_state.s.readable
+        if not sub_recursive:
+            # Recursion markers depend on the container's ancestors, so
+            # renderings which contain them can't be reused.
+            capture.renders.append((
+                key, start, capture.stream.tell(), sub_readable, child_keys,
+            ))
+            capture.child_keys[-1].append((key, start))
+        if outermost:
+            text = capture.stream.getvalue()
+            state.write(text)
+            for key, start, end, render_readable, child_keys in capture.renders:
+                self._next_renders[key] = (
+                    text, start, end, render_readable, child_keys,
+                )
+        state.s.recursive = recursive or sub_recursive
+        state.s.readable = readable and sub_readable
+
 
 if __name__ == "__main__":
     try:
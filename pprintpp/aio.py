@@ -0,0 +1,99 @@
+"""
+asyncio support: pretty-print large objects from coroutines without blocking
+the event loop.
+
+Formatting is done by the same engine as ``pprintpp.pformat``, so the output
+is identical, but control is returned to the event loop every
+``yield_every`` objects or ``yield_interval`` seconds, whichever comes first.
+
+This module requires Python 3.5+, so it isn't imported by ``pprintpp``.
+"""
+import time
+import asyncio
+
+from . import PrettyPrinter, TextIO
+
+
+DEFAULT_YIELD_EVERY = 1000
+DEFAULT_YIELD_INTERVAL = 0.005
+
+
+async def _run(printer, object, state, yield_every, yield_interval,
+               on_yield=None):
+    stack = [printer._iter_format(object, state)]
+    batch = min(yield_every, 100)
+    count = 0
+    clock = time.monotonic
+    deadline = clock() + yield_interval
+    while stack:
+        printer._run_frames(stack, batch)
+        count += batch
+        if not stack or (count < yield_every and clock() < deadline):
+            continue
+        if on_yield is None:
+            await asyncio.sleep(0)
+        else:
+            await on_yield()
+        count = 0
+        deadline = clock() + yield_interval
+
+
+def _take_bytes(stream):
+    stream.flush()
+    buffer = stream.buffer
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+async def apformat(object, indent=4, width=80, depth=None,
+                   yield_every=DEFAULT_YIELD_EVERY,
+                   yield_interval=DEFAULT_YIELD_INTERVAL):
+    """Format a Python object into a pretty-printed representation,
+    periodically yielding to the event loop."""
+    printer = PrettyPrinter(indent=indent, width=width, depth=depth)
+    sio = TextIO()
+    state = printer.get_default_state().replace(
+        stream=sio,
+        encoding=sio.encoding,
+    )
+    await _run(printer, object, state, yield_every, yield_interval)
+    return sio.getvalue()
+
+
+async def apprint(object, stream=None, indent=4, width=80, depth=None,
+                  yield_every=DEFAULT_YIELD_EVERY,
+                  yield_interval=DEFAULT_YIELD_INTERVAL,
+                  encoding="utf-8"):
+    """Pretty-print a Python object to a stream [default is sys.stdout],
+    periodically yielding to the event loop.
+
+    ``stream`` may also be an ``asyncio.StreamWriter``, in which case output
+    is encoded with ``encoding`` and written as it is produced, waiting for
+    the writer to drain each time control is yielded."""
+    printer = PrettyPrinter(stream=stream, indent=indent, width=width,
+                            depth=depth)
+    if not hasattr(stream, "drain"):
+        state = printer.get_default_state()
+        await _run(printer, object, state, yield_every, yield_interval)
+        state.write("\n")
+        return
+
+    writer = stream
+    sio = TextIO(encoding=encoding)
+    state = printer.get_default_state().replace(
+        stream=sio,
+        encoding=sio.encoding,
+    )
+
+    async def flush():
+        data = _take_bytes(sio)
+        if data:
+            writer.write(data)
+        await writer.drain()
+
+    await _run(printer, object, state, yield_every, yield_interval,
+               on_yield=flush)
+    state.write("\n")
+    await flush()
@@ -8,26 +8,38 @@ https://stackoverflow.com/users/71522/david-wolever
 and answered by:
 https://stackoverflow.com/users/1530134/kupiakos
 """
+import io
+import sys
+
 import IPython
 from traitlets.config import Configurable
-from traitlets import Int
+from traitlets import Bool, Int
+
+from . import PrettyPrinter, TruncatingWriter, OutputTruncated
 
-from . import pformat
+try:
+    from shutil import get_terminal_size
+except ImportError:
+    # Python 2
+    get_terminal_size = None
 
 
 original_representation = IPython.lib.pretty.RepresentationPrinter
 DEFAULT_INDENTATION = 2
+DEFAULT_MAX_OUTPUT = 1000000
+TRUNCATED_MARKER = "\n... (output truncated)"
 
 
 def load_ipython_extension(ipython):
-    ipython.config.PPrintPP.indentation = DEFAULT_INDENTATION
-    IPython.lib.pretty.RepresentationPrinter = PPrintPPRepresentation
     pprintpp = PPrintPP(parent=ipython, config=ipython.config)
     ipython.configurables.append(pprintpp)
+    PPrintPPRepresentation.pprintpp = pprintpp
+    IPython.lib.pretty.RepresentationPrinter = PPrintPPRepresentation
 
 
 def unload_ipython_extension(ipython):
     IPython.lib.pretty.RepresentationPrinter = original_representation
+    PPrintPPRepresentation.pprintpp = None
     try:
         pprintpp = [
             configurable for configurable in ipython.configurables
@@ -44,13 +56,17 @@ class PPrintPPRepresentation(object):
     A pretty printer that uses pprintpp
     """
 
-    def __init__(self, stream, *args, **kwargs):
+    # The ``PPrintPP`` instance created by ``load_ipython_extension``. IPython
+    # creates a new representation printer for every output, so the
+    # configured ``PrettyPrinter`` is kept there instead.
+    pprintpp = None
+
+    def __init__(self, stream, verbose=False, max_width=79, *args, **kwargs):
         self.stream = stream
-        self.config = IPython.get_ipython().config
+        self.max_width = max_width
 
     def pretty(self, obj):
-        indentation = self.config.PPrintPP.indentation
-        self.stream.write(pformat(obj, indent=indentation))
+        self.pprintpp.write(obj, self.stream, self.max_width)
 
     def flush(self):
         pass
@@ -60,4 +76,58 @@ class PPrintPP(Configurable):
     """
     PPrintPP configuration
     """
-    indentation = Int(config=True)
+    indentation = Int(DEFAULT_INDENTATION, config=True, help="""
+        Number of spaces to indent for each level of nesting.
+    """)
+    width = Int(0, config=True, help="""
+        Maximum width of the output. If 0, the width of the terminal is used
+        when IPython is running in a terminal, and
+        ``PlainTextFormatter.max_width`` otherwise (ex, in a notebook).
+    """)
+    max_output = Int(DEFAULT_MAX_OUTPUT, config=True, help="""
+        Maximum number of characters to output; longer outputs are truncated.
+        If 0, output is never truncated.
+    """)
+    streaming = Bool(True, config=True, help="""
+        Write output to IPython's display stream as it is formatted. If
+        False, the whole output is formatted before any of it is written.
+    """)
+
+    _printer = None
+    _printer_config = None
+
+    def get_width(self, default):
+        if self.width > 0:
+            return self.width
+        if get_terminal_size is not None and sys.stdout.isatty():
+            # Leave the last column empty so the terminal doesn't wrap
+            return get_terminal_size((default + 1, 0)).columns - 1
+        return default
+
+    def get_printer(self, width):
+        """
+        Returns a ``PrettyPrinter`` for the current configuration, which is
+        only re-created when the configuration (or width) changes.
+        """
+        config = (self.indentation, width)
+        if self._printer is None or self._printer_config != config:
+            self._printer = PrettyPrinter(indent=self.indentation, width=width)
+            self._printer_config = config
+        return self._printer
+
+    def write(self, obj, stream, default_width=79):
+        printer = self.get_printer(self.get_width(default_width))
+        output = self.streaming and stream or io.StringIO()
+        target = output
+        if self.max_output > 0:
+            target = TruncatingWriter(output, self.max_output)
+        state = printer.get_default_state().replace(
+            stream=target,
+            encoding=None,
+        )
+        try:
+            printer._format(obj, state)
+        except OutputTruncated:
+            output.write(TRUNCATED_MARKER)
+        if output is not stream:
+            stream.write(output.getvalue())
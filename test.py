@@ -1,5 +1,6 @@
 from __future__ import print_function
 
+import io
 import sys
 import ctypes
 import textwrap
@@ -12,6 +13,18 @@ import pp
 import pprintpp as p
 from pprintpp import Counter, defaultdict, OrderedDict
 
+try:
+    import asyncio
+    from pprintpp import aio
+except (ImportError, SyntaxError):
+    # Python < 3.5
+    aio = None
+
+try:
+    from pprintpp import ipython
+except ImportError:
+    ipython = None
+
 class PPrintppTestBase(object):
     def assertStdout(self, expected, trim=True):
         if trim:
@@ -70,7 +83,23 @@ class MyCounterWithRepr(p.Counter):
     def __repr__(self):
         return "MyCounterWithRepr('dummy')"
 
+class SelfIterator(object):
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self
+
+    next = __next__
+
+class MultiLineRepr(object):
+    def __repr__(self):
+        return "line1\nline2"
+
 class TestPPrint(PPrintppTestBase):
+    # The width available to the contents of a bytes literal in 30 columns
+    # (``repr(b"")`` is ``b''`` on Python 3, but ``''`` on Python 2)
+    bytes_width = 30 - len(repr(b""))
     uni_safe = u"\xe9 \u6f02 \u0e4f \u2661"
     uni_unsafe = u"\u200a \u0302 \n"
     slashed = lambda s: u"%s'%s'" %(
@@ -83,6 +112,11 @@ class TestPPrint(PPrintppTestBase):
         param("unsafe", uni_unsafe, slashed(uni_unsafe)),
         param("encoding-aware", uni_safe, slashed(uni_safe), encoding="ascii"),
         param("high-end-chars", u"\U0002F9B2", slashed(u"\U0002F9B2"), encoding="ascii"),
+        param("nested", [uni_safe], "[%s]" %(slashed(uni_safe), ), encoding="ascii"),
+        param(
+            "partially-encodable", u"\xe9 \u6f02",
+            u"%s'\xe9 \\u6f02'" %(p.u_prefix, ), encoding="latin-1",
+        ),
     ])
     def test_unicode(self, name, input, expected, encoding="utf-8"):
         stream = p.TextIO(encoding=encoding)
@@ -147,6 +181,269 @@ class TestPPrint(PPrintppTestBase):
             p.pprint(input, stream=stream)
             assert_equal(stream.getvalue().rstrip("\n"), expected)
 
+    @parameterized([
+        param([1, 2, 3], "list", (7, 10)),
+        param((1, ), "tuple", (3, 4)),
+        # Strings only have a width bound where ``str.isprintable`` exists
+        param({"a": None}, "dict", (4, p._isprintable and 10 or None)),
+        param(list(range(1000)), "list", (2998, None)),
+        param([1, [2]], "list", (4, None)),
+        param([1, 2], "list", (4, 8), True),
+    ])
+    def test_oneline_width_bounds(self, obj, typeish, expected,
+                                  depth_limited=False):
+        assert_equal(
+            p._oneline_width_bounds(obj, typeish, 77, depth_limited),
+            expected,
+        )
+
+    @parameterized([
+        param(["a" * 74], "['%s']" %("a" * 74, )),
+        param(["a" * 75], "[\n    (\n        '%s'\n        '%s'\n    ),\n]" %("a" * 70, "a" * 5)),
+        param(list(range(3)), "[0, 1, 2]"),
+    ])
+    def test_oneline_width_limit(self, input, expected):
+        assert_equal(p.pformat(input), expected)
+
+    def test_oneline_trial_flags(self):
+        recursive = []
+        recursive.append(recursive)
+        printer = p.PrettyPrinter(stream=p.TextIO())
+        assert_equal(printer.isrecursive([recursive]), True)
+        assert_equal(printer.isreadable([object()]), False)
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        obj = root = []
+        for _ in range(depth):
+            obj.append([])
+            obj = obj[0]
+        obj.append(root)
+        result = p.pformat(root, indent=0)
+        assert_equal(result.count("["), depth + 1)
+        assert_equal(result.count("<Recursion on list with id=%s>" %(id(root), )), 1)
+
+    @parameterized([
+        param(1, "1"),
+        param(
+            {"b": [1, (2, )], "a": u"\xe9"},
+            "{'a': %s'%s', 'b': [1, (2, )]}" %(p.u_prefix, u"\xe9"),
+        ),
+        param(["x" * 100] * 2, "['%s', '%s']" %("x" * 100, "x" * 100)),
+        param(MyList([1, set([2])]), "MyList([1, set([2])])"),
+        param(list(range(10)), "[0, 1, 2, ...", 13),
+        param("x" * 20, "'xxxxxx...", 10),
+        param(list(range(5)), "[0, 1, 2, 3, 4]", 15),
+    ])
+    def test_saferepr(self, input, expected, maxlen=None):
+        assert_equal(p.saferepr(input, maxlen=maxlen), expected)
+
+    def test_saferepr_escapes_newlines(self):
+        assert_equal(p.saferepr([MultiLineRepr()]), "[line1\\nline2]")
+
+    def test_saferepr_clips_before_repr(self):
+        writer = p.TruncatingWriter(None, 3)
+        assert_equal(p._clip_to_stream(u"x" * 1000, writer), u"xxx")
+        assert_equal(p._clip_to_stream(b"x", writer), b"x")
+        big = "x" * 1000
+        assert_equal(p.saferepr([big], maxlen=10), "['xxxxx...")
+        assert_equal(p.saferepr(set([big]), maxlen=12), "set(['xxx...")
+
+    def test_saferepr_deep_recursive(self):
+        depth = sys.getrecursionlimit() * 2
+        obj = root = []
+        for _ in range(depth):
+            obj.append([])
+            obj = obj[0]
+        obj.append(root)
+        result = p.saferepr(root, maxlen=None)
+        assert_equal(result.count("["), depth + 1)
+        assert_equal(result.count("<Recursion on list with id=%s>" %(id(root), )), 1)
+        assert_equal(len(p.saferepr(root, maxlen=1000)), 1000)
+
+    if p._test_has_collections:
+        @parameterized([
+            param(Counter("aaabbc"), "Counter({'a': 3, 'b': 2, ...})", 2),
+            param(Counter("aaabbc"), "Counter({'a': 3, 'b': 2, 'c': 1})", 3),
+            param(
+                Counter(dict(("%02d" %(i, ), i) for i in range(20))),
+                "Counter({\n    '19': 19,\n    '18': 18,\n    ...,\n})",
+                2, 20,
+            ),
+            param({"a": Counter("ab")}, "{'a': Counter({'a': 1, 'b': 1})}", 2),
+            param(Counter("ab"), "Counter({...})", 0),
+        ])
+        def test_most_common(self, input, expected, most_common, width=80):
+            printer = p.PrettyPrinter(width=width, most_common=most_common)
+            assert_equal(printer.pformat(input), expected)
+
+    def test_mapping_values_are_not_missing(self):
+        obj = defaultdict(list, [(2, 2), (1, 1)])
+        assert_equal(p.pformat(obj), "defaultdict(%r, {1: 1, 2: 2})" %(list, ))
+        assert_equal(len(obj), 2)
+
+    @parameterized([
+        param(4, "[\n    line1\n    line2,\n    1,\n]"),
+        param(300, "[\n%sline1\n%sline2,\n%s1,\n]" %((" " * 300, ) * 3)),
+    ])
+    def test_multi_line_repr(self, indent, expected):
+        assert_equal(p.pformat([MultiLineRepr(), 1], indent=indent), expected)
+
+    @parameterized([
+        param(iter([1, 2]), "list_iterator([1, 2])"),
+        param((i for i in range(5)), "generator([0, 1, 2, ...])"),
+        param(iter([]), "list_iterator([])"),
+        param(
+            getattr({"a": 1}, "viewkeys", {"a": 1}.keys)(),
+            "dict_keys(['a'])",
+        ),
+        param(
+            iter(["x" * 40] * 4),
+            "list_iterator([\n    '%s',\n    '%s',\n    '%s',\n    ...,\n])"
+            %(("x" * 40, ) * 3),
+        ),
+    ])
+    def test_max_iter_items(self, input, expected):
+        if not p.PY3:
+            expected = expected.replace("list_iterator", "listiterator")
+        printer = p.PrettyPrinter(max_iter_items=3)
+        assert_equal(printer.pformat(input), expected)
+        assert_equal(printer.isreadable(input), False)
+
+    def test_max_iter_items_files(self):
+        open_file = io.StringIO(u"line1\nline2\n")
+        closed_file = io.StringIO()
+        closed_file.close()
+        obj = {"open": open_file, "closed": closed_file}
+        printer = p.PrettyPrinter(max_iter_items=3)
+        assert_equal(printer.pformat(obj), p.pformat(obj))
+        assert_equal(open_file.read(), u"line1\nline2\n")
+
+    def test_max_iter_items_consumes_once(self):
+        gen = (i for i in range(100))
+        printer = p.PrettyPrinter(max_iter_items=2, width=30)
+        assert_equal(printer.pformat([gen, "x" * 10]), textwrap.dedent("""\
+            [
+                generator([0, 1, ...]),
+                'xxxxxxxxxx',
+            ]"""))
+        assert_equal(next(gen), 3)
+
+    def test_max_iter_items_recursive(self):
+        obj = SelfIterator()
+        marker = "<Recursion on SelfIterator with id=%s>" %(id(obj), )
+        printer = p.PrettyPrinter(max_iter_items=2, width=200)
+        assert_equal(
+            printer.pformat(obj),
+            "SelfIterator([%s, %s, ...])" %(marker, marker),
+        )
+
+    # Python 2.6 has no memoryview, so bytes are written by their repr
+    if p._memoryview is not None:
+        @parameterized([
+            param(b"abc", "%r" %(b"abc", )),
+            param(bytearray(b"abc"), "bytearray(%r)" %(b"abc", )),
+            param(memoryview(b"abc"), "memoryview(%r)" %(b"abc", )),
+            param(bytearray(), "bytearray(%r)" %(b"", )),
+            param(
+                [b"a" * 30],
+                "[\n    (\n        %r\n        %r\n    ),\n]"
+                %(b"a" * (bytes_width - 8), b"a" * (38 - bytes_width)),
+            ),
+            param(
+                bytearray(b"\xff" * 8),
+                "bytearray(\n    %r\n    %r\n)" %(
+                    b"\xff" * ((bytes_width - 4) // 4),
+                    b"\xff" * (8 - (bytes_width - 4) // 4),
+                ),
+            ),
+            param([b"a" * 30], "[%r...]" %(b"a" * 3, ), 3),
+            param(
+                b"a" * 60,
+                "(\n    %r\n    %r\n    ...\n)"
+                %(b"a" * (bytes_width - 4), b"a" * (34 - bytes_width)),
+                30,
+            ),
+        ])
+        def test_bytes(self, input, expected, max_bytes=None):
+            printer = p.PrettyPrinter(width=30, max_bytes=max_bytes)
+            assert_equal(printer.pformat(input), expected)
+
+    @parameterized([
+        param({"b": [1, (2, )], "a": None}, "{'a':None,'b':[1,(2,)]}",
+              '{"a":null,"b":[1,[2]]}'),
+        param(OrderedDict([("x", 1.5)]), "OrderedDict([('x',1.5)])",
+              '{"x":1.5}'),
+        param(set([3, 1]), "set([1,3])", "[1,3]"),
+        param({1: "x", (1, 2): True}, "{1:'x',(1,2):True}",
+              '{"1":"x","(1,2)":true}'),
+        param([u"\xe9" * 100], "[%r]" %(u"\xe9" * 100, ),
+              '["%s"]' %("\\u00e9" * 100, )),
+        param([float("inf")], "[inf]", "[Infinity]"),
+        param({2 ** 70: 2 ** 70}, "{%r:%r}" %(2 ** 70, 2 ** 70),
+              '{"%s":%s}' %(2 ** 70, 2 ** 70)),
+    ])
+    def test_output(self, input, literal, json):
+        printer = p.PrettyPrinter(width=10, output="literal")
+        assert_equal(printer.pformat(input), literal)
+        printer = p.PrettyPrinter(width=10, output="json")
+        assert_equal(printer.pformat(input), json)
+
+    def test_compact_is_ignored(self):
+        # ``pprint.PrettyPrinter``'s ``compact`` argument is accepted
+        for compact in (False, True):
+            printer = p.PrettyPrinter(compact=compact)
+            assert_equal(printer.pformat([1, 2]), "[1, 2]")
+
+    def test_output_recursive(self):
+        obj = [1]
+        obj.append(obj)
+        marker = "<Recursion on list with id=%s>" %(id(obj), )
+        printer = p.PrettyPrinter(output="literal")
+        assert_equal(printer.pformat(obj), "[1,%s]" %(marker, ))
+        printer = p.PrettyPrinter(output="json")
+        assert_equal(printer.pformat(obj), '[1,"%s"]' %(marker, ))
+
+    def test_label_shared(self):
+        shared = [1, 2]
+        recursive = []
+        recursive.extend([recursive, recursive])
+        printer = p.PrettyPrinter(label_shared=True)
+        assert_equal(
+            printer.pformat({"a": shared, "b": [shared, (shared, )]}),
+            "{'a': #1=[1, 2], 'b': [#1, (#1, )]}",
+        )
+        assert_equal(printer.pformat([recursive]), "[#1=[#1, #1]]")
+        assert_equal(printer.pformat([[1], [1]]), "[[1], [1]]")
+        assert_equal(printer.pformat(5), "5")
+        assert_equal(printer.pformat(None), "None")
+        assert_equal(printer.pformat("ab"), "'ab'")
+        printer = p.PrettyPrinter(label_shared=True, output="literal")
+        assert_equal(printer.pformat([shared, shared]), "[#1=[1,2],#1]")
+
+    def test_label_shared_abandoned_trial(self):
+        # The one-line trial of the first item labels ``shared`` before it's
+        # abandoned, so the label has to be given again.
+        shared = [1, 2]
+        printer = p.PrettyPrinter(label_shared=True, width=30)
+        assert_equal(printer.pformat([[shared, "x" * 15], shared]),
+                     textwrap.dedent("""\
+            [
+                [
+                    #1=[1, 2],
+                    'xxxxxxxxxxxxxxx',
+                ],
+                #1,
+            ]"""))
+
+    if p.PY3:
+        def test_non_byte_memoryview(self):
+            # Casting to bytes would hide the view's format and shape
+            view = memoryview(b"\x01\x00\x00\x00").cast("i")
+            printer = p.PrettyPrinter()
+            assert_equal(printer.pformat([view]), "[%r]" %(view, ))
+            assert_equal(printer.isreadable(view), False)
+
     def test_unhashable_repr(self):
         # In Python 3, C extensions can define a __repr__ method which is an
         # instance of `instancemethod`, which is unhashable. It turns out to be
@@ -168,6 +465,248 @@ class TestPPrint(PPrintppTestBase):
         assert_equal(p.pformat(obj), "some-repr")
 
 
+class TestDiff(object):
+    @parameterized([
+        param(1, 1, ""),
+        param(1, 2, "- 1\n+ 2"),
+        param(1, 1.0, "- 1\n+ 1.0"),
+        param({"a": 1, "b": 2}, {"a": 1, "b": 3}, "- ['b']: 2\n+ ['b']: 3"),
+        param({"a": 1}, {"b": 1}, "- ['a']: 1\n+ ['b']: 1"),
+        param({"a": [1, 2]}, {"a": [1, 3]}, "- ['a'][1]: 2\n+ ['a'][1]: 3"),
+        param([1, 2, 3], [1, 4, 5, 3], "- [1]: 2\n+ [1]: 4\n+ [2]: 5"),
+        param(set([1, 2]), set([2, 3]), "- {1}\n+ {3}"),
+        param([1], (1, ), "- [1]\n+ (1, )"),
+        param(
+            OrderedDict([(1, 1), (2, 2)]),
+            OrderedDict([(1, 1), (2, 3)]),
+            "- [2]: 2\n+ [2]: 3",
+        ),
+        param(
+            OrderedDict([(1, 1), (2, 2)]),
+            OrderedDict([(2, 2), (1, 1)]),
+            "- OrderedDict([(1, 1), (2, 2)])\n+ OrderedDict([(2, 2), (1, 1)])",
+        ),
+    ])
+    def test_pformat_diff(self, a, b, expected):
+        assert_equal(p.pformat_diff(a, b), expected)
+
+    def test_multiline_values(self):
+        assert_equal(p.pformat_diff({}, {"a": ["x" * 30] * 2}, width=40), textwrap.dedent("""\
+            + ['a']: [
+                  'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxx',
+                  'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxx',
+              ]"""))
+
+    def test_recursive(self):
+        a = [1]
+        a.append(a)
+        b = [2]
+        b.append(b)
+        assert_equal(p.pformat_diff(a, b).splitlines()[:2], ["- [0]: 1", "+ [0]: 2"])
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() * 2
+        a = [1]
+        b = [2]
+        for _ in range(depth):
+            a = [a]
+            b = [b]
+        path = "[0]" * (depth + 1)
+        assert_equal(p.pformat_diff(a, b), "- %s: 1\n+ %s: 2" %(path, path))
+
+
+class CustomRepr(object):
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+
+class CountingIncrementalPrettyPrinter(p.IncrementalPrettyPrinter):
+    """ Records the id of each container whose items are written (other
+        than by one-line trials, which don't use the cache). """
+    def _write_nested_real(self, object, state, *args, **kwargs):
+        if state.write_constrain is None:
+            self.written.append(id(object))
+        return p.IncrementalPrettyPrinter._write_nested_real(
+            self, object, state, *args, **kwargs
+        )
+
+
+class TestIncrementalPrettyPrinter(object):
+    def test_matches_pformat(self):
+        printer = p.IncrementalPrettyPrinter(width=40)
+        obj = {"a": [1, 2, 3], "b": {"c": "d"}, "e": [[1], [2]]}
+        assert_equal(printer.pformat(obj), p.pformat(obj, width=40))
+        obj["a"].append("x" * 40)
+        obj["b"]["f"] = None
+        assert_equal(printer.pformat(obj), p.pformat(obj, width=40))
+        obj["e"][1] = [2]
+        del obj["a"]
+        assert_equal(printer.pformat(obj), p.pformat(obj, width=40))
+
+    def test_unchanged_subtrees_are_reused(self):
+        printer = CountingIncrementalPrettyPrinter()
+        unchanged = [[i] for i in range(20)]
+        changed = [[i] for i in range(20)]
+        obj = {"unchanged": unchanged, "changed": changed}
+        printer.written = []
+        printer.pformat(obj)
+        changed.append(1)
+        printer.written = []
+        assert_equal(printer.pformat(obj), p.pformat(obj))
+        assert id(unchanged) not in printer.written
+        assert id(changed) in printer.written
+
+    def test_nested_renders_are_kept(self):
+        printer = CountingIncrementalPrettyPrinter()
+        halves = [[[[i] for i in range(20)] for _ in range(3)] for _ in range(2)]
+        printer.written = []
+        printer.pformat(halves)
+        halves[0].append(1)
+        printer.pformat(halves)
+        halves[1][2].append(1)
+        printer.written = []
+        assert_equal(printer.pformat(halves), p.pformat(halves))
+        # The renderings inside ``halves[1]`` were reused by the second call,
+        # and must still be reused by the third
+        assert id(halves[1][2]) in printer.written
+        for reused in [halves[0]] + halves[0] + halves[1][:2]:
+            assert id(reused) not in printer.written
+
+    def test_deeply_nested(self):
+        printer = p.IncrementalPrettyPrinter()
+        obj = inner = {}
+        for _ in range(sys.getrecursionlimit() + 100):
+            inner["a"] = inner = {}
+        printer.pformat(obj)
+        assert_equal(printer.pformat(obj), p.pformat(obj))
+
+    def test_stream_encoding(self):
+        stream = p.TextIO(encoding="ascii")
+        printer = p.IncrementalPrettyPrinter(stream=stream)
+        obj = {"a": [u"\xe9t\xe9", "x" * 80]}
+        printer.pformat(obj)
+        printer.pprint(obj)
+        expected = p.TextIO(encoding="ascii")
+        p.pprint(obj, stream=expected)
+        assert_equal(stream.getvalue(), expected.getvalue())
+
+    def test_object_at_two_positions(self):
+        printer = p.IncrementalPrettyPrinter()
+        shared = ["x" * 40, "y" * 40]
+        obj = {"zz": shared}
+        printer.pformat(obj)
+        shared.append("NEW")
+        obj["a"] = shared
+        assert_equal(printer.pformat(obj), p.pformat(obj))
+
+    @parameterized([
+        param(bytearray(b"x"), lambda leaf: leaf.extend(b"yyy")),
+        param(CustomRepr("a"), lambda leaf: setattr(leaf, "text", "b")),
+    ])
+    def test_mutable_leaves(self, leaf, mutate):
+        printer = p.IncrementalPrettyPrinter()
+        obj = {"a": [leaf, "x" * 80]}
+        printer.pformat(obj)
+        mutate(leaf)
+        assert_equal(printer.pformat(obj), p.pformat(obj))
+
+    def test_recursive(self):
+        printer = p.IncrementalPrettyPrinter()
+        obj = [1]
+        obj.append(obj)
+        assert_equal(printer.pformat(obj), p.pformat(obj))
+        assert_equal(printer.pformat(obj), p.pformat(obj))
+
+
+class MockStreamWriter(object):
+    def __init__(self):
+        self.chunks = []
+        self.drains = 0
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def drain(self):
+        self.drains += 1
+        return asyncio.sleep(0)
+
+
+if aio is not None:
+    class TestAsyncio(object):
+        obj = {
+            "a": [list(range(i)) for i in range(30)],
+            "b": [u"\xe9t\xe9", u"\u200a", set([1, 2])],
+        }
+
+        def run(self, coro):
+            loop = asyncio.new_event_loop()
+            ticks = []
+            def tick():
+                ticks.append(1)
+                loop.call_soon(tick)
+            loop.call_soon(tick)
+            try:
+                return loop.run_until_complete(coro), len(ticks)
+            finally:
+                loop.close()
+
+        def test_apformat(self):
+            result, ticks = self.run(aio.apformat(self.obj, yield_every=10))
+            assert_equal(result, p.pformat(self.obj))
+            assert ticks > 5, ticks
+
+        def test_apprint_stream_writer(self):
+            writer = MockStreamWriter()
+            _, ticks = self.run(aio.apprint(self.obj, writer, yield_every=10))
+            assert_equal(
+                b"".join(writer.chunks).decode("utf-8"),
+                p.pformat(self.obj) + "\n",
+            )
+            assert writer.drains > 5, writer.drains
+            assert len(writer.chunks) > 1, writer.chunks
+
+        def test_apprint_text_stream(self):
+            stream = p.TextIO()
+            self.run(aio.apprint(self.obj, stream))
+            assert_equal(stream.getvalue(), p.pformat(self.obj) + "\n")
+
+
+if ipython is not None:
+    class TestIPython(object):
+        def format(self, obj, default_width=80, **config):
+            stream = p.TextIO()
+            ipython.PPrintPP(**config).write(obj, stream, default_width)
+            return stream.getvalue()
+
+        @parameterized([
+            param({}, "[\n  'aaaaaaaaaa',\n  'aaaaaaaaaa',\n]"),
+            param({"width": 40}, "['aaaaaaaaaa', 'aaaaaaaaaa']"),
+            param({"indentation": 4, "streaming": False},
+                  "[\n    'aaaaaaaaaa',\n    'aaaaaaaaaa',\n]"),
+        ])
+        def test_config(self, config, expected):
+            assert_equal(self.format(["a" * 10] * 2, 20, **config), expected)
+
+        @parameterized([
+            param(True),
+            param(False),
+        ])
+        def test_max_output(self, streaming):
+            result = self.format(list(range(1000)), max_output=10,
+                                 streaming=streaming)
+            assert_equal(result, "[\n  0,\n  1" + ipython.TRUNCATED_MARKER)
+
+        def test_printer_is_reused(self):
+            pprintpp = ipython.PPrintPP()
+            printer = pprintpp.get_printer(80)
+            assert pprintpp.get_printer(80) is printer
+            pprintpp.indentation = 8
+            assert pprintpp.get_printer(80) is not printer
+
+
 if __name__ == "__main__":
     import nose
     nose.main()